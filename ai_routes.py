@@ -1,19 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Header
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import date
 import database_models
 from database import get_db
+from core.idempotency import run_idempotent
+from core.config import get_settings
+from core import rate_limit
+from core.circuit_breaker import CircuitBreaker
+from core.logger import logger
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+import threading
+import time
 import uuid
-import requests
-import os
-
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
-limiter = Limiter(key_func=get_remote_address)
+settings = get_settings()
 
 
 # ================================
@@ -63,12 +67,131 @@ Message:
 """
 
 
-def call_groq(prompt: str) -> str:
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+
+@lru_cache(maxsize=1)
+def get_groq_session():
+    # one keep-alive pool per worker instead of a new TLS handshake per reply
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=settings.groq_pool_size))
+    return session
+
+
+def warm_groq_connection():
+    # listing models is free and leaves an open connection in the pool
+    if not settings.groq_api_key:
+        return
+
+    get_groq_session().get(
+        f"{GROQ_BASE_URL}/models",
+        headers={"Authorization": f"Bearer {settings.groq_api_key}"},
+        timeout=5
+    )
+
+
+# canned replies per classify_message category, sent when Groq is down
+FALLBACK_REPLIES = {
+    "Objection": "Thanks for being upfront, I appreciate it. If priorities change, I'd be glad to reconnect. Wishing you a great quarter!",
+    "Follow-up": "Thanks for following up! I'm reviewing this now and will get back to you with a clear answer shortly.",
+    "Interested": "Great to hear you're interested! Would a quick 15-minute call this week work to walk through the details?",
+    "Question": "Good question! Let me get you the specifics. Would a short call or a quick summary by message suit you better?",
+    "Cold Intro": "Thanks for reaching out and connecting! I'd be happy to learn more about what you're working on.",
+}
+
+
+def fallback_reply(message: str) -> str:
+    return FALLBACK_REPLIES[classify_message(message)]
+
+
+# ================================
+# Groq client
+# ================================
+#
+# every /ai/generate call has GROQ_DEADLINE_SECONDS in total. an attempt
+# still running after GROQ_HEDGE_AFTER_SECONDS (or one that failed with a
+# timeout / 429 / 5xx) gets a second, hedged attempt, the first reply wins.
+# completions have no side effects, so sending the prompt twice is safe.
+# attempts go through a circuit breaker: while it is open no call is made and
+# the route answers right away with a template reply.
+
+GROQ_MAX_ATTEMPTS = 2
+
+
+class UpstreamUnavailable(Exception):
+    # open breaker, timeout, 429 or 5xx: answered with a template reply
+    pass
+
+
+groq_breaker = CircuitBreaker(
+    "groq",
+    failure_rate=settings.groq_breaker_failure_rate,
+    slow_call_rate=settings.groq_breaker_slow_call_rate,
+    slow_call_seconds=settings.groq_breaker_slow_call_seconds,
+    window_size=settings.groq_breaker_window,
+    min_calls=settings.groq_breaker_min_calls,
+    open_seconds=settings.groq_breaker_open_seconds,
+)
+
+
+@lru_cache(maxsize=1)
+def get_groq_executor() -> ThreadPoolExecutor:
+    # room for every attempt of every /ai request admission control lets in,
+    # so a hedge never waits in the executor queue behind other requests
+    max_requests = settings.admission_ai[0] or settings.groq_pool_size
+    return ThreadPoolExecutor(max_workers=GROQ_MAX_ATTEMPTS * max_requests, thread_name_prefix="groq")
+
+
+def groq_attempt(payload: dict, deadline: float, finished: threading.Event) -> str:
+    # the timeout is taken from what is left when the attempt actually starts
+    timeout = deadline - time.monotonic()
+
+    # the caller already has its reply (or gave up) while this one was queued
+    if finished.is_set() or timeout <= 0:
+        groq_breaker.abandon()
+        raise UpstreamUnavailable("deadline exceeded")
+
     headers = {
-        "Authorization": f"Bearer {os.getenv('GROQ_API_KEY')}",
+        "Authorization": f"Bearer {settings.groq_api_key}",
         "Content-Type": "application/json"
     }
 
+    started = time.monotonic()
+
+    try:
+        response = get_groq_session().post(
+            f"{GROQ_BASE_URL}/chat/completions",
+            headers=headers,
+            json=payload,
+            timeout=timeout
+        )
+    except Exception as e:
+        groq_breaker.record(False, time.monotonic() - started)
+        raise UpstreamUnavailable(f"request failed: {type(e).__name__}")
+
+    duration = time.monotonic() - started
+
+    if response.status_code == 429 or response.status_code >= 500:
+        groq_breaker.record(False, duration)
+        raise UpstreamUnavailable(f"status={response.status_code}")
+
+    # any other answer means the upstream itself is healthy
+    groq_breaker.record(True, duration)
+
+    if response.status_code != 200:
+        # bad key or payload: a template reply would hide it, so this is a 502.
+        # the upstream body stays in the logs, it is not sent to the client
+        logger.error(f"Groq rejected the request status={response.status_code} body={response.text[:500]}")
+        raise HTTPException(status_code=502, detail="AI provider rejected the request")
+
+    data = response.json()
+    return data["choices"][0]["message"]["content"]
+
+
+def call_groq(prompt: str) -> str:
     payload = {
         "model": "llama-3.1-8b-instant",
         "max_tokens": 200,
@@ -78,18 +201,58 @@ def call_groq(prompt: str) -> str:
         ]
     }
 
-    response = requests.post(
-        "https://api.groq.com/openai/v1/chat/completions",
-        headers=headers,
-        json=payload,
-        timeout=15
-    )
+    started = time.monotonic()
+    deadline = started + settings.groq_deadline_seconds
+    hedge_at = started + settings.groq_hedge_after_seconds
 
-    if response.status_code != 200:
-        raise HTTPException(status_code=500, detail=response.text)
+    executor = get_groq_executor()
+    finished = threading.Event()
+    pending = set()
+    attempts = 0
+    last_error = "deadline exceeded"
 
-    data = response.json()
-    return data["choices"][0]["message"]["content"]
+    def launch() -> bool:
+        nonlocal attempts
+
+        if attempts >= GROQ_MAX_ATTEMPTS or not groq_breaker.allow():
+            return False
+
+        attempts += 1
+        pending.add(executor.submit(groq_attempt, payload, deadline, finished))
+        return True
+
+    if not launch():
+        raise UpstreamUnavailable("circuit open")
+
+    try:
+        while pending:
+            now = time.monotonic()
+
+            if now >= deadline:
+                break
+
+            wake_at = hedge_at if attempts < GROQ_MAX_ATTEMPTS and now < hedge_at else deadline
+            done, pending = wait(pending, timeout=wake_at - now, return_when=FIRST_COMPLETED)
+
+            for attempt in done:
+                try:
+                    return attempt.result()
+                except UpstreamUnavailable as e:
+                    last_error = str(e)
+
+            if done or time.monotonic() >= hedge_at:
+                launch()
+
+        raise UpstreamUnavailable(last_error)
+
+    finally:
+        # once we have a reply or gave up, attempts that haven't started must
+        # never reach Groq. a running one ends on its own (deadline) timeout
+        finished.set()
+
+        for attempt in pending:
+            if attempt.cancel():
+                groq_breaker.abandon()
 
 
 def get_daily_limit(plan: str) -> int:
@@ -123,10 +286,12 @@ def register_user(req: RegisterRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/generate")
-@limiter.limit("20/minute")
+@rate_limit.limit("20/minute")
 def generate_reply(
     request: Request,
     req: GenerateRequest,
+    response: Response,
+    idempotency_key: str | None = Header(default=None),
     db: Session = Depends(get_db)
 ):
 
@@ -137,29 +302,57 @@ def generate_reply(
     if not user:
         raise HTTPException(status_code=401, detail="Invalid API key")
 
-    today = str(date.today())
+    def generate():
+        today = str(date.today())
 
-    if user.last_reset != today:
-        user.usage_count = 0
-        user.last_reset = today
+        if user.last_reset != today:
+            user.usage_count = 0
+            user.last_reset = today
+            db.commit()
+
+        limit = get_daily_limit(user.plan)
+
+        if user.usage_count >= limit:
+            raise HTTPException(status_code=403, detail="Daily limit reached")
+
+        prompt = build_prompt(req.message)
+        ai_reply = call_groq(prompt)
+
+        user.usage_count += 1
         db.commit()
 
-    limit = get_daily_limit(user.plan)
+        return {
+            "reply": ai_reply.strip(),
+            "replies_left": limit - user.usage_count,
+            "detected_type": classify_message(req.message),
+            "fallback": False
+        }
+
+    # a retried request returns the stored reply instead of calling Groq again
+    try:
+        body, replayed = run_idempotent(
+            idempotency_key,
+            scope=f"ai:{req.api_key}",
+            fingerprint=req.message,
+            func=generate
+        )
 
-    if user.usage_count >= limit:
-        raise HTTPException(status_code=403, detail="Daily limit reached")
+    except UpstreamUnavailable as e:
+        # template reply, not counted against the daily limit and not stored
+        # for the Idempotency-Key so a retry can still get a real one
+        logger.warning(f"Groq unavailable, sending template reply: {e}")
 
-    prompt = build_prompt(req.message)
-    ai_reply = call_groq(prompt)
+        return {
+            "reply": fallback_reply(req.message),
+            "replies_left": get_daily_limit(user.plan) - user.usage_count,
+            "detected_type": classify_message(req.message),
+            "fallback": True
+        }
 
-    user.usage_count += 1
-    db.commit()
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
 
-    return {
-        "reply": ai_reply.strip(),
-        "replies_left": limit - user.usage_count,
-        "detected_type": classify_message(req.message)
-    }
+    return body
 
 
 @router.post("/upgrade")
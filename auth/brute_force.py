@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+
+# brute force protection settings
+
+MAX_FAILED_LOGIN_ATTEMPTS = 5
+FAILED_LOGIN_WINDOW = timedelta(minutes=15)
+LOCKOUT_DURATION = timedelta(minutes=15)
+
+
+# in-memory sliding window of failed logins per user
+#
+# failed attempts are only written to the users table once a lockout
+# triggers, so a credential stuffing run doesn't turn into one UPDATE per
+# bad password. the window lives in the worker process, so with several
+# workers an attacker gets up to MAX_FAILED_LOGIN_ATTEMPTS per worker before
+# the (shared) lock_until column is set.
+
+class LoginAttemptTracker:
+
+    def __init__(self, max_attempts : int , window : timedelta , max_keys : int = 100_000):
+        self.max_attempts = max_attempts
+        self.window_seconds = window.total_seconds()
+        self.max_keys = max_keys
+        self._attempts : dict[int , deque] = {}
+        self._lock = threading.Lock()
+
+
+    def _prune(self , attempts : deque , now : float):
+        while attempts and now - attempts[0] > self.window_seconds:
+            attempts.popleft()
+
+
+    def _sweep(self , now : float):
+        # drop users whose failures have all fallen out of the window
+
+        for key in list(self._attempts):
+            attempts = self._attempts[key]
+            self._prune(attempts , now)
+            if not attempts:
+                del self._attempts[key]
+
+
+    def record_failure(self , key : int) -> int:
+        # returns the number of failures inside the window, including this one
+
+        now = time.monotonic()
+
+        with self._lock:
+            attempts = self._attempts.get(key)
+
+            if attempts is None:
+                if len(self._attempts) >= self.max_keys:
+                    self._sweep(now)
+                attempts = self._attempts[key] = deque(maxlen=self.max_attempts)
+
+            self._prune(attempts , now)
+            attempts.append(now)
+            return len(attempts)
+
+
+    def reset(self , key : int):
+        with self._lock:
+            self._attempts.pop(key , None)
+
+
+login_attempts = LoginAttemptTracker(
+    max_attempts=MAX_FAILED_LOGIN_ATTEMPTS,
+    window=FAILED_LOGIN_WINDOW,
+)
@@ -0,0 +1,104 @@
+import argparse
+import time
+from auth.hashing import build_password_context
+
+
+# picks password hashing costs that take about --target-ms on this machine
+#
+#    python -m auth.calibrate --scheme argon2 --target-ms 50
+#
+# prints the env vars to put in .env
+
+SAMPLE_PASSWORD = "calibration-password-123"
+
+
+def measure_ms(context , samples : int) -> float:
+
+    context.hash(SAMPLE_PASSWORD)    # first call loads the backend
+
+    timings = []
+
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.hash(SAMPLE_PASSWORD)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def calibrate_bcrypt(target_ms : float , samples : int) -> dict:
+
+    best = None
+
+    # every extra round doubles the cost, stop at the first one over target
+    for rounds in range(4 , 20):
+        elapsed = measure_ms(build_password_context(["bcrypt"] , bcrypt_rounds=rounds) , samples)
+        print(f"bcrypt rounds={rounds}: {elapsed:.1f} ms")
+
+        if best is None or abs(elapsed - target_ms) < abs(best[1] - target_ms):
+            best = (rounds , elapsed)
+
+        if elapsed >= target_ms:
+            break
+
+    return {"PASSWORD_SCHEMES" : "bcrypt", "BCRYPT_ROUNDS" : best[0]}
+
+
+def calibrate_argon2(target_ms : float , samples : int , memory_kib : int , parallelism : int) -> dict:
+
+    # memory is the main defence against GPUs, so keep it and lower it only
+    # when a single pass is already over budget
+    while True:
+        elapsed = measure_ms(
+            build_password_context(["argon2"] , argon2_time_cost=1 , argon2_memory_cost=memory_kib , argon2_parallelism=parallelism),
+            samples
+        )
+        print(f"argon2 memory={memory_kib} KiB time_cost=1: {elapsed:.1f} ms")
+
+        if elapsed <= target_ms or memory_kib <= 8 * 1024:
+            break
+
+        memory_kib //= 2
+
+    time_cost = 1
+
+    # each pass over memory costs about the same, so scale linearly
+    if elapsed < target_ms:
+        time_cost = max(1 , round(target_ms / elapsed))
+        elapsed = measure_ms(
+            build_password_context(["argon2"] , argon2_time_cost=time_cost , argon2_memory_cost=memory_kib , argon2_parallelism=parallelism),
+            samples
+        )
+        print(f"argon2 memory={memory_kib} KiB time_cost={time_cost}: {elapsed:.1f} ms")
+
+    return {
+        "PASSWORD_SCHEMES" : "argon2,bcrypt",
+        "ARGON2_TIME_COST" : time_cost,
+        "ARGON2_MEMORY_COST" : memory_kib,
+        "ARGON2_PARALLELISM" : parallelism,
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Calibrate password hashing cost")
+    parser.add_argument("--scheme" , choices=["argon2" , "bcrypt"] , default="argon2")
+    parser.add_argument("--target-ms" , type=float , default=50)
+    parser.add_argument("--samples" , type=int , default=5)
+    parser.add_argument("--memory-mib" , type=int , default=64)
+    parser.add_argument("--parallelism" , type=int , default=2)
+    args = parser.parse_args()
+
+    if args.scheme == "bcrypt":
+        settings = calibrate_bcrypt(args.target_ms , args.samples)
+    else:
+        settings = calibrate_argon2(args.target_ms , args.samples , args.memory_mib * 1024 , args.parallelism)
+
+    print()
+    for name , value in settings.items():
+        print(f"{name}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from functools import lru_cache
+from core.config import get_settings
+
+
+# password hashing settings
+#
+# PASSWORD_SCHEMES is an ordered list, the first scheme hashes new passwords
+# and every other one is only accepted for verification. hashes made with an
+# older scheme or with different cost parameters are flagged by
+# needs_update() and get rehashed on the next successful login.
+# run `python -m auth.calibrate` to pick costs for the current machine.
+#
+# passlib is imported when the first context is built, not at boot.
+
+
+def build_password_context(
+        schemes : list[str] | None = None,
+        bcrypt_rounds : int | None = None,
+        argon2_time_cost : int | None = None,
+        argon2_memory_cost : int | None = None,
+        argon2_parallelism : int | None = None,
+        ):
+    from passlib.context import CryptContext
+
+    settings = get_settings()
+
+    schemes = list(schemes or settings.password_schemes)
+    bcrypt_rounds = bcrypt_rounds or settings.bcrypt_rounds
+    argon2_time_cost = argon2_time_cost or settings.argon2_time_cost
+    argon2_memory_cost = argon2_memory_cost or settings.argon2_memory_cost
+    argon2_parallelism = argon2_parallelism or settings.argon2_parallelism
+
+    options = {}
+
+    if "bcrypt" in schemes:
+        options.update({
+            "bcrypt__rounds" : bcrypt_rounds,
+            "bcrypt__min_rounds" : bcrypt_rounds,   # weaker hashes need an update
+        })
+
+    if "argon2" in schemes:
+        options.update({
+            "argon2__type" : "ID",
+            "argon2__time_cost" : argon2_time_cost,
+            "argon2__memory_cost" : argon2_memory_cost,
+            "argon2__parallelism" : argon2_parallelism,
+        })
+
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        **options
+    )
+
+
+@lru_cache(maxsize=1)
+def get_password_context():
+    return build_password_context()
@@ -0,0 +1,89 @@
+import os
+import glob
+import json
+import hashlib
+from functools import lru_cache
+from core.logger import logger
+from core.config import get_settings
+
+
+# signing keys for access tokens
+#
+# HS* algorithms keep using the shared SECRET_KEY. for ES256 / RS256 every
+# key lives in JWT_KEYS_DIR as "<kid>.pem" (private key) or "<kid>.pub.pem"
+# (public key of a retired key). JWT_ACTIVE_KID picks the key new tokens are
+# signed with, every other key stays valid for verification and is published
+# in the JWKS. to rotate: add the new key, switch JWT_ACTIVE_KID, and delete
+# the old file once ACCESS_TOKEN_EXPIRE_MINUTES have passed.
+
+ASYMMETRIC_ALGORITHMS = {"ES256", "ES384", "ES512", "RS256", "RS384", "RS512"}
+
+
+class KeyRing:
+
+    def __init__(self , algorithm : str , signing_kid : str | None , signing_key , verification_keys : dict):
+        self.algorithm = algorithm
+        self.signing_kid = signing_kid
+        self.signing_key = signing_key
+        self.verification_keys = verification_keys
+
+        public_jwks = []
+
+        if algorithm in ASYMMETRIC_ALGORITHMS:
+            for kid , key in verification_keys.items():
+                public_jwk = (key if key.is_public() else key.public_key()).to_dict()
+                public_jwk.update({"kid": kid , "use": "sig" , "alg": algorithm})
+                public_jwks.append(public_jwk)
+
+        # the JWKS document only changes on restart, so render it once
+        self.jwks_body = json.dumps({"keys": public_jwks} , separators=(",", ":")).encode()
+        self.jwks_etag = '"' + hashlib.sha256(self.jwks_body).hexdigest()[:32] + '"'
+
+
+    def verification_key(self , kid : str | None):
+        if self.algorithm not in ASYMMETRIC_ALGORITHMS:
+            return self.signing_key
+
+        return self.verification_keys.get(kid)
+
+
+def _load_asymmetric_keys(algorithm : str , keys_dir : str , active_kid : str | None) -> KeyRing:
+    from jose import jwk
+    from jose.exceptions import JWKError
+
+    keys = {}
+    signing_key = None
+
+    for path in sorted(glob.glob(os.path.join(keys_dir , "*.pem"))):
+        filename = os.path.basename(path)
+        kid = filename[:-len(".pub.pem")] if filename.endswith(".pub.pem") else filename[:-len(".pem")]
+
+        with open(path) as key_file:
+            key = jwk.construct(key_file.read() , algorithm)
+
+        if kid == active_kid:
+            if key.is_public():
+                raise JWKError(f"Active signing key {kid} has no private part")
+            signing_key = key
+
+        keys[kid] = key
+
+    if signing_key is None:
+        raise JWKError(f"Signing key {active_kid} not found in {keys_dir}")
+
+    logger.info(f"Loaded {len(keys)} JWT keys, active kid={active_kid}")
+
+    return KeyRing(algorithm , active_kid , signing_key , keys)
+
+
+@lru_cache(maxsize=1)
+def get_key_ring() -> KeyRing:
+    # keys are parsed once per process instead of on every encode / decode
+    from jose import jwk
+
+    settings = get_settings()
+
+    if settings.algorithm in ASYMMETRIC_ALGORITHMS:
+        return _load_asymmetric_keys(settings.algorithm , settings.jwt_keys_dir , settings.jwt_active_kid)
+
+    return KeyRing(settings.algorithm , None , jwk.construct(settings.secret_key , settings.algorithm) , {})
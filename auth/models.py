@@ -27,7 +27,7 @@ class RefreshToken(Base):
     user_id = Column(Integer,ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     token_hash = Column(String , nullable=False , unique=True)
-    experies_at = Column(DateTime , nullable=False)
+    expires_at = Column("experies_at" , DateTime , nullable=False)    # column name kept from the first schema
     revoked = Column(Boolean , default=False)
 
     created_by = Column(DateTime(timezone=True) , server_default=func.now())
@@ -45,4 +45,17 @@ class PasswordResetToken(Base):
     expires_at = Column(DateTime(timezone=True) ,  nullable=False)
     used = Column(Boolean , default=False , nullable=False)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now() , nullable=False)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now() , nullable=False)
+
+
+# access tokens revoked before their expiry (logout)
+
+class RevokedToken(Base):
+
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String , primary_key=True)
+    user_id = Column(Integer , ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime(timezone=True) , nullable=False , index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now() , nullable=False)
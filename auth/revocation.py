@@ -0,0 +1,106 @@
+import time
+import threading
+from datetime import datetime , timezone
+from sqlalchemy.orm import Session
+from auth.models import RevokedToken
+from core.bloom import BloomFilter
+from core.logger import logger
+from core.config import get_settings
+
+
+# denylist for access tokens revoked before they expire
+#
+# revoked jtis live in the revoked_tokens table until the token would have
+# expired anyway. every worker keeps a bloom filter of that table, so the
+# usual "not revoked" answer needs no query; only filter hits go to the DB.
+# the filter is rebuilt from the table every REVOCATION_SYNC_SECONDS, which
+# is also how revocations made by other workers reach this one.
+
+REVOCATION_FILTER_ERROR_RATE = 0.001
+
+
+class RevocationList:
+
+    def __init__(self , capacity : int , sync_seconds : int):
+        self.capacity = capacity
+        self.sync_seconds = sync_seconds
+        self._filter = BloomFilter(capacity , REVOCATION_FILTER_ERROR_RATE)
+        self._last_sync = None
+        self._revoked_during_rebuild = None
+        self._lock = threading.Lock()
+
+
+    def _rebuild(self , db : Session):
+
+        now = datetime.now(timezone.utc)
+
+        with self._lock:
+            self._revoked_during_rebuild = set()
+
+        jtis = [
+            jti for (jti,) in db.query(RevokedToken.jti).filter(RevokedToken.expires_at > now)
+        ]
+
+        bloom = BloomFilter(max(self.capacity , 2 * len(jtis)) , REVOCATION_FILTER_ERROR_RATE)
+
+        for jti in jtis:
+            bloom.add(jti)
+
+        # tokens revoked by this worker while the query ran may be missing
+        # from its snapshot, carry them over before swapping
+        with self._lock:
+            for jti in self._revoked_during_rebuild:
+                bloom.add(jti)
+            self._revoked_during_rebuild = None
+            self._filter = bloom
+
+        logger.info(f"Revocation filter rebuilt entries={len(jtis)}")
+
+
+    def sync(self , db : Session , force : bool = False):
+
+        now = time.monotonic()
+
+        with self._lock:
+            if not force and self._last_sync is not None and now - self._last_sync < self.sync_seconds:
+                return
+            self._last_sync = now
+
+        self._rebuild(db)
+
+
+    def is_revoked(self , db : Session , jti : str) -> bool:
+
+        self.sync(db)
+
+        if jti not in self._filter:
+            return False
+
+        return db.query(RevokedToken.jti).filter(
+            RevokedToken.jti == jti,
+            RevokedToken.expires_at > datetime.now(timezone.utc)
+        ).first() is not None
+
+
+    def revoke(self , db : Session , jti : str , user_id : int , expires_at : datetime):
+
+        # expired entries are useless, clear them while we are writing anyway
+        db.query(RevokedToken).filter(
+            RevokedToken.expires_at <= datetime.now(timezone.utc)
+        ).delete(synchronize_session=False)
+
+        if db.get(RevokedToken , jti) is None:
+            db.add(RevokedToken(jti=jti , user_id=user_id , expires_at=expires_at))
+
+        db.commit()
+
+        with self._lock:
+            self._filter.add(jti)
+            if self._revoked_during_rebuild is not None:
+                self._revoked_during_rebuild.add(jti)
+
+
+revocation_list = RevocationList(
+    capacity=get_settings().revocation_filter_capacity,
+    sync_seconds=get_settings().revocation_sync_seconds,
+)
@@ -1,20 +1,26 @@
-from fastapi import APIRouter , Depends , status , HTTPException
+from fastapi import APIRouter , Depends , status , HTTPException , Request , Response
 from sqlalchemy.orm import Session
 from datetime import datetime , timezone , timedelta
 from database import get_db
 from auth.schemas import UserResponse , UserCreate , ForgotPasswordRequest , ResetPasswordRequest
 from auth.models import User , RefreshToken , PasswordResetToken
-from auth.utils import hash_password , verify_password , create_access_token , get_current_user , generate_refresh_token , hash_refresh_token , get_refresh_token_expiry , verify_refresh_token , create_refresh_token_pair
+from auth.brute_force import login_attempts , MAX_FAILED_LOGIN_ATTEMPTS , LOCKOUT_DURATION
+from auth.keys import get_key_ring
+from auth.revocation import revocation_list
+from auth.utils import hash_password , verify_and_update_password , create_access_token , get_current_user , get_access_token_payload , generate_refresh_token , hash_refresh_token , get_refresh_token_expiry , verify_refresh_token , create_refresh_token_pair
 import secrets
 from auth.schemas import UserLogin
 from core.logger import logger
 from core.email import send_reset_password_email
-import os 
+from core.config import get_settings
 
 
 
 router = APIRouter(prefix="/auth" , tags=["Auth"])
 
+jwks_router = APIRouter(tags=["Auth"])
+
+
 @router.post("/register" , response_model=UserResponse)
 def register(user : UserCreate , db : Session = Depends(get_db)):
 
@@ -43,7 +49,7 @@ def register(user : UserCreate , db : Session = Depends(get_db)):
 
 
 @router.post("/login")
-def userlogin(user: UserLogin, db: Session = Depends(get_db)):
+def userlogin(user: UserLogin, request: Request, db: Session = Depends(get_db)):
 
     logger.info(f"Login attempt for email={user.email}")
 
@@ -63,27 +69,40 @@ def userlogin(user: UserLogin, db: Session = Depends(get_db)):
             detail="Invalid email or password"
         )
 
-    if not verify_password(user.password, db_user.hashed_password):
+    password_valid, new_password_hash = verify_and_update_password(user.password, db_user.hashed_password)
+
+    if not password_valid:
         logger.warning(f"Login failed: invalid password user_id={db_user.id}")
 
-        db_user.failed_login_attempts += 1
-        db_user.last_failed_login = datetime.now(timezone.utc)
+        failed_attempts = login_attempts.record_failure(db_user.id)
 
-        if db_user.failed_login_attempts >= 5:
-            db_user.lock_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-            logger.warning(f"Account locked due to brute force user_id={db_user.id}")
+        if failed_attempts >= MAX_FAILED_LOGIN_ATTEMPTS:
+            now = datetime.now(timezone.utc)
 
-        db.commit()
+            db_user.failed_login_attempts = failed_attempts
+            db_user.last_failed_login = now
+            db_user.lock_until = now + LOCKOUT_DURATION
+            db.commit()
+
+            login_attempts.reset(db_user.id)
+            logger.warning(f"Account locked due to brute force user_id={db_user.id}")
 
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
 
-    db_user.failed_login_attempts = 0
-    db_user.lock_until = None
-    db_user.last_failed_login = None
-    db.commit()
+    login_attempts.reset(db_user.id)
+
+    # only touch the users row when there is a previous lockout to clear
+    if db_user.failed_login_attempts or db_user.lock_until or db_user.last_failed_login:
+        db_user.failed_login_attempts = 0
+        db_user.lock_until = None
+        db_user.last_failed_login = None
+
+    if new_password_hash:
+        db_user.hashed_password = new_password_hash
+        logger.info(f"Password rehashed with current parameters user_id={db_user.id}")
 
     payload = {"user_id": db_user.id}
     access_token = create_access_token(payload)
@@ -98,9 +117,13 @@ def userlogin(user: UserLogin, db: Session = Depends(get_db)):
         revoked=False
     )
 
+    # counter reset, rehash and refresh token insert go out in one transaction
     db.add(db_refresh_token)
     db.commit()
 
+    # keeps this user's next reads on the primary (see database.ReplicaRouter)
+    request.state.user_id = db_user.id
+
     logger.info(f"Login successful user_id={db_user.id}")
 
     return {
@@ -120,7 +143,22 @@ def get_me(current_user = Depends(get_current_user)):
 
 @router.post("/logout")
 
-def logout(current_user = Depends(get_current_user)):
+def logout(
+    current_user = Depends(get_current_user),
+    payload : dict = Depends(get_access_token_payload),
+    db : Session = Depends(get_db)
+):
+
+    if payload.get("jti"):
+        revocation_list.revoke(
+            db,
+            jti=payload["jti"],
+            user_id=current_user.id,
+            expires_at=datetime.fromtimestamp(payload["exp"], timezone.utc)
+        )
+
+    logger.info(f"Access token revoked user_id={current_user.id}")
+
     return{
         "message" : "logged out successfully"
     }
@@ -183,7 +221,7 @@ def refresh_access_token(
     db.commit()
 
     new_access_token = create_access_token(
-        payload={"user_id": matched_token.user_id}
+        data={"user_id": matched_token.user_id}
     )
 
     logger.info(f"Refresh token rotated user_id={matched_token.user_id}")
@@ -223,7 +261,7 @@ def forgot_password(
 
         logger.info(f"Password reset token issued user_id={user.id}")
 
-        reset_link= f"{os.getenv('FRONTEND_URL')}/reset-password?token={reset_token}"
+        reset_link= f"{get_settings().frontend_url}/reset-password?token={reset_token}"
 
         send_reset_password_email(user.email , reset_link)
 
@@ -281,3 +319,26 @@ def reset_password(
     return {
         "message" : "Password reset successful. Please login again"
     }
+
+
+
+# public keys for services that verify access tokens locally
+
+@jwks_router.get("/.well-known/jwks.json")
+def jwks(request : Request):
+
+    key_ring = get_key_ring()
+
+    headers = {
+        "Cache-Control" : f"public, max-age={get_settings().jwks_max_age_seconds}",
+        "ETag" : key_ring.jwks_etag
+    }
+
+    if request.headers.get("if-none-match") == key_ring.jwks_etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED , headers=headers)
+
+    return Response(
+        content=key_ring.jwks_body,
+        media_type="application/json",
+        headers=headers
+    )
@@ -1,79 +1,107 @@
-from passlib.context import CryptContext
-import os
-from jose import JWTError , jwt 
-from dotenv import load_dotenv
 from datetime import datetime , timedelta , timedelta , timezone
 from fastapi.security import OAuth2PasswordBearer
-from fastapi import Depends , HTTPException , status
+from fastapi import Depends , HTTPException , Request , status
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db , get_read_db , sessionLocal
+from core.config import get_settings
 from auth.models import User
+from auth.keys import get_key_ring
+from auth.hashing import get_password_context
+from auth.revocation import revocation_list
 import secrets
 
 
 
-load_dotenv()
-
-# password storing and hashing
-
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto"
-)
+# password storing and hashing (schemes and costs are set in auth/hashing.py)
 
 def hash_password(password : str) -> str:
-     return pwd_context.hash(password)
+     return get_password_context().hash(password)
 
 def verify_password(plain_password : str , hashed_password : str) -> bool:
-     return pwd_context.verify(plain_password , hashed_password)
+     return get_password_context().verify(plain_password , hashed_password)
 
+def verify_and_update_password(plain_password : str , hashed_password : str) -> tuple[bool , str | None]:
+     # also returns a new hash when the stored one uses an outdated scheme or cost
+     return get_password_context().verify_and_update(plain_password , hashed_password)
 
 
 
-# JWT 
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# JWT (python-jose is imported on first use, it is slow to import)
 
 
 # function for creating token
 
 def create_access_token(data:dict):  # access token creation
+     from jose import jwt
+
      to_encode = data.copy()
 
      expire = datetime.now(timezone.utc) + timedelta(
-          minutes = ACCESS_TOKEN_EXPIRE_MINUTES
+          minutes = get_settings().access_token_expire_minutes
      )
 
-     to_encode.update({"exp":expire})
+     # jti identifies the token so logout can revoke it
+     to_encode.update({"exp":expire , "jti":secrets.token_urlsafe(16)})
+
+     key_ring = get_key_ring()
+
+     # the kid header tells other services which JWKS key to verify with
+     headers = {"kid": key_ring.signing_kid} if key_ring.signing_kid else None
 
      encoded_jwt = jwt.encode(
           to_encode,
-          SECRET_KEY,
-          algorithm=ALGORITHM
+          key_ring.signing_key,
+          algorithm=key_ring.algorithm,
+          headers=headers
      )
 
      return encoded_jwt
 
 
 
+def warm_crypto():
+     # loads the hashing backend, the signing keys and python-jose so the
+     # first login doesn't pay for it
+     get_password_context().hash("warm-up-password")
+
+     from jose import jwt
+
+     key_ring = get_key_ring()
+     token = create_access_token({"user_id": 0})
+     jwt.decode(token , key_ring.verification_key(key_ring.signing_kid) , algorithms=[key_ring.algorithm])
+
+
+
 # getting the current user 
 
 #token extractor
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(
+# the denylist is checked on the primary: a replica that hasn't replayed the
+# logout yet would accept the revoked token. it only queries on bloom filter
+# hits and rebuilds, so this costs next to nothing
+
+def get_access_token_payload(
           token : str =  Depends(oauth2_scheme) ,
           db : Session = Depends(get_db)
-          ):
+          ) -> dict:
      
 
+     from jose import JWTError , jwt
+
+     key_ring = get_key_ring()
+
      try : 
+          key = key_ring.verification_key(jwt.get_unverified_header(token).get("kid"))
+
+          if key is None:
+               raise JWTError("Unknown signing key")
+
           payload = jwt.decode(
                token,
-               SECRET_KEY,
-               algorithms=[ALGORITHM]
+               key,
+               algorithms=[key_ring.algorithm]
           )
      
      except JWTError :
@@ -83,6 +111,24 @@ def get_current_user(
           )
      
 
+     jti = payload.get("jti")
+
+     if jti is not None and revocation_list.is_revoked(db , jti):
+          raise HTTPException(
+               status_code=status.HTTP_401_UNAUTHORIZED,
+               detail = "Could not validate credentials"
+          )
+
+     return payload
+
+
+def get_current_user(
+          request : Request ,
+          payload : dict = Depends(get_access_token_payload) ,
+          db : Session = Depends(get_read_db)
+          ):
+     
+
      user_id = payload.get("user_id")
 
      if user_id is None :
@@ -99,10 +145,26 @@ def get_current_user(
                status_code=status.HTTP_401_UNAUTHORIZED,
                detail= "Could not validate credentials"
           )
+
+     # read replica stickiness is keyed on it (database.ReplicaRouter)
+     request.state.user_id = user.id
      
      return user 
 
 
+def get_streaming_user(request : Request , token : str = Depends(oauth2_scheme)):
+     # for streamed responses: yield dependencies are only closed after the
+     # body is sent, so get_current_user would keep a pooled connection for
+     # the whole stream. this one looks the user up in its own short session
+     db = sessionLocal()
+
+     try :
+          return get_current_user(request , get_access_token_payload(token , db) , db)
+
+     finally :
+          db.close()
+
+
 # creating the function to create and secure the refresh token
 
 def generate_refresh_token() -> str:
@@ -110,11 +172,11 @@ def generate_refresh_token() -> str:
 
 
 def hash_refresh_token(token : str) -> str:
-     return pwd_context.hash(token)    # hashing the token for safety
+     return get_password_context().hash(token)    # hashing the token for safety
 
 
 def verify_refresh_token(token :str , hash_token : str) -> bool:
-     return pwd_context.verify(token , hash_token)  # verifying the token and the hashed token
+     return get_password_context().verify(token , hash_token)  # verifying the token and the hashed token
 
 def get_refresh_token_expiry(days : int = 7):
      return datetime.now(timezone.utc) + timedelta(days=days) # checking the expiry time
@@ -125,7 +187,7 @@ def create_refresh_token_pair() -> dict:
      
      refresh_token = secrets.token_urlsafe(64)
 
-     hashed_refresh_token = pwd_context.hash(refresh_token)
+     hashed_refresh_token = get_password_context().hash(refresh_token)
 
      expiry_date = datetime.now(timezone.utc) + timedelta(days=7)
 
@@ -0,0 +1,84 @@
+import time
+import argparse
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
+import orjson
+
+import database_models
+from models import ProductResponse
+
+
+# rows/second for the GET /products body, old path vs fast path
+#
+#    python -m benchmarks.serialization --rows 5000
+#
+# uses an in-memory sqlite database so it measures python-side cost only
+
+
+def seed(engine, rows: int):
+    database_models.Base.metadata.create_all(bind=engine, tables=[database_models.Product.__table__])
+
+    with Session(engine) as db:
+        db.execute(insert(database_models.Product), [
+            {
+                "name": f"product {i}",
+                "description": f"description of product {i}",
+                "price": i * 1.25,
+                "quantity": i % 100,
+            }
+            for i in range(rows)
+        ])
+        db.commit()
+
+
+product_list = TypeAdapter(list[ProductResponse])
+
+
+def orm_and_pydantic(db: Session) -> bytes:
+    # what FastAPI does with response_model=list[ProductResponse]: validate
+    # from attributes, then Pydantic's own JSON serializer
+    products = db.query(database_models.Product).all()
+    return product_list.dump_json(product_list.validate_python(products, from_attributes=True))
+
+
+def columns_and_orjson(db: Session) -> bytes:
+    # what get_all_products does now
+    Product = database_models.Product
+    rows = db.execute(select(
+        Product.id, Product.name, Product.description, Product.price, Product.quantity, Product.version
+    )).mappings()
+    return orjson.dumps([dict(row) for row in rows])
+
+
+def measure(engine, func, rows: int, repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        with Session(engine) as db:
+            start = time.perf_counter()
+            func(db)
+            best = min(best, time.perf_counter() - start)
+
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark product list serialization")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine, args.rows)
+
+    before = measure(engine, orm_and_pydantic, args.rows, args.repeat)
+    after = measure(engine, columns_and_orjson, args.rows, args.repeat)
+
+    print(f"ORM + Pydantic   : {before:12,.0f} rows/s")
+    print(f"columns + orjson : {after:12,.0f} rows/s")
+    print(f"speedup          : {after / before:12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
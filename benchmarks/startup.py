@@ -0,0 +1,62 @@
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+
+# import time breakdown for the app, the part of a cold start we control
+#
+#    python -m benchmarks.startup --top 15
+#
+# runs `python -X importtime -c "import main"` in a fresh interpreter and
+# lists the slowest top-level imports
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def measure(repo_root: str) -> list[tuple[str, int, int]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=repo_root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    imports = []
+
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, len(indent), int(cumulative_us)))
+
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the slowest imports of the app")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    imports = measure(repo_root)
+
+    # the outermost level is what `import main` pulled in directly or
+    # through the app's own modules
+    min_indent = min(indent for _, indent, _ in imports)
+    top_level = [
+        (module, cumulative) for module, indent, cumulative in imports
+        if indent <= min_indent + 2 and module != "main"
+    ]
+    total = next(cumulative for module, _, cumulative in imports if module == "main")
+
+    print(f"{'module':40} {'ms':>8}")
+    for module, cumulative in sorted(top_level, key=lambda item: -item[1])[:args.top]:
+        print(f"{module:40} {cumulative / 1000:8.1f}")
+    print(f"{'import main (total)':40} {total / 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
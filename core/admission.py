@@ -0,0 +1,159 @@
+import math
+import time
+import asyncio
+from collections import deque
+from starlette.responses import JSONResponse
+from core.logger import logger
+
+
+# admission control / load shedding
+#
+# routes are grouped into classes (password hashing, database, upstream AI,
+# bulk transfer) and each class gets its own concurrency limit and a bounded
+# wait queue. a request that finds the queue full, or that waits longer than
+# the class queue timeout, is answered right away with 503 + Retry-After
+# instead of piling up in the shared threadpool. unclassified routes ("/",
+# "/ready", jwks, the SSE feed) are never limited, so they stay fast while the
+# expensive classes are saturated.
+#
+# when a proxy sets X-Request-Start (ms or "t=<ms>" since the epoch) the time
+# spent in front of the worker counts against the queue timeout too: a request
+# that already waited longer than the client would wait is dropped unprocessed.
+
+REQUEST_START_HEADER = b"x-request-start"
+
+
+class RouteClass:
+
+    def __init__(self , name : str , max_concurrent : int , max_queue : int , queue_timeout : float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.shed = 0
+        self._waiters : deque[asyncio.Future] = deque()
+
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+
+    @property
+    def retry_after(self) -> int:
+        return max(1 , math.ceil(self.queue_timeout))
+
+
+    async def acquire(self , timeout : float) -> bool:
+        # runs on the event loop only, so no lock is needed
+
+        # already waited longer than the client will, don't start it
+        if timeout <= 0:
+            return False
+
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return True
+
+        if len(self._waiters) >= self.max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter , timeout)
+            return True
+
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just as we gave up on it
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+            if isinstance(e , asyncio.TimeoutError):
+                return False
+            raise
+
+
+    def release(self):
+        # hand the slot straight to the next waiter, active stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.active -= 1
+
+
+def queued_before_arrival(headers : list) -> float:
+    # seconds the request spent in front of the worker, 0 when unknown
+    for name , value in headers:
+        if name != REQUEST_START_HEADER:
+            continue
+
+        try:
+            started_ms = float(value.decode().removeprefix("t="))
+        except ValueError:
+            return 0.0
+
+        # some proxies send microseconds
+        if started_ms > 1e14:
+            started_ms /= 1000
+
+        return max(0.0 , time.time() - started_ms / 1000)
+
+    return 0.0
+
+
+class AdmissionControlMiddleware:
+
+    def __init__(self , app , route_classes : list[tuple[str , RouteClass]]):
+        # (path prefix, class) pairs, the first matching prefix wins
+        self.app = app
+        self.route_classes = route_classes
+
+
+    def classify(self , path : str) -> RouteClass | None:
+        for prefix , route_class in self.route_classes:
+            if path.startswith(prefix):
+                return route_class
+
+        return None
+
+
+    async def __call__(self , scope , receive , send):
+        if scope["type"] != "http":
+            return await self.app(scope , receive , send)
+
+        route_class = self.classify(scope["path"])
+
+        if route_class is None or route_class.max_concurrent <= 0:
+            return await self.app(scope , receive , send)
+
+        timeout = route_class.queue_timeout - queued_before_arrival(scope["headers"])
+
+        if not await route_class.acquire(timeout):
+            route_class.shed += 1
+
+            if route_class.shed % 100 == 1:
+                logger.warning(
+                    f"Shedding load class={route_class.name} active={route_class.active} "
+                    f"queued={route_class.queued} shed_total={route_class.shed}"
+                )
+
+            response = JSONResponse(
+                status_code=503,
+                content={"detail" : "Server is busy, retry later"},
+                headers={"Retry-After" : str(route_class.retry_after)}
+            )
+            return await response(scope , receive , send)
+
+        # the slot is held until the whole body is sent, streamed ones included
+        try:
+            await self.app(scope , receive , send)
+        finally:
+            route_class.release()
@@ -0,0 +1,39 @@
+import math
+import hashlib
+
+
+# small bloom filter for "definitely not in the set" checks
+#
+# no false negatives, false positives at roughly error_rate once the filter
+# holds `capacity` items. positions come from double hashing one blake2b
+# digest, so a lookup is one hash call and a few bit probes.
+
+class BloomFilter:
+
+    def __init__(self , capacity : int , error_rate : float = 0.001):
+        capacity = max(capacity , 1)
+
+        self.size = max(8 , int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1 , round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+
+    def _positions(self , item : str):
+        digest = hashlib.blake2b(item.encode() , digest_size=16).digest()
+        first = int.from_bytes(digest[:8] , "little")
+        second = int.from_bytes(digest[8:] , "little") | 1
+
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+
+    def add(self , item : str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+
+    def __contains__(self , item : str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
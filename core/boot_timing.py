@@ -0,0 +1,24 @@
+import time
+
+
+# wall clock spent in each boot phase of this worker, logged at startup so
+# cold start regressions show up in the deploy logs.
+# run `python -m benchmarks.startup` for a per-module import breakdown
+
+_started = time.perf_counter()
+_last = _started
+_phases : list[tuple[str , float]] = []
+
+
+def mark(phase : str):
+    global _last
+
+    now = time.perf_counter()
+    _phases.append((phase , (now - _last) * 1000))
+    _last = now
+
+
+def summary() -> str:
+    total = (_last - _started) * 1000
+    parts = " , ".join(f"{phase}={ms:.0f}ms" for phase , ms in _phases)
+    return f"{parts} , total={total:.0f}ms"
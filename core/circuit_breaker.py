@@ -0,0 +1,107 @@
+import time
+import threading
+from collections import deque
+from core.logger import logger
+
+
+# circuit breaker for an upstream service
+#
+# closed: calls go through and their outcome is kept for the last
+# `window_size` calls. once at least `min_calls` are recorded and the share
+# of failed calls reaches `failure_rate`, or the share of calls slower than
+# `slow_call_seconds` reaches `slow_call_rate`, the breaker opens.
+# open: allow() is False for `open_seconds`, callers answer without waiting
+# on the upstream.
+# half open: one probe call at a time is let through, its success closes the
+# breaker again and its failure (or slowness) reopens it.
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+
+    def __init__(
+        self ,
+        name : str ,
+        failure_rate : float ,
+        slow_call_rate : float ,
+        slow_call_seconds : float ,
+        window_size : int ,
+        min_calls : int ,
+        open_seconds : float
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes : deque[tuple[bool , bool]] = deque(maxlen=window_size)   # (failed, slow)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self.state = HALF_OPEN
+                logger.info(f"Circuit half open, probing name={self.name}")
+
+            if self._probing:
+                return False
+
+            self._probing = True
+            return True
+
+
+    def record(self , succeeded : bool , duration : float):
+        slow = duration >= self.slow_call_seconds
+
+        with self._lock:
+            if self.state == HALF_OPEN and self._probing:
+                self._probing = False
+
+                if succeeded and not slow:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"Circuit closed name={self.name}")
+                else:
+                    self._open(f"probe failed duration={duration:.1f}s")
+                return
+
+            # late results of calls started before the breaker opened
+            if self.state != CLOSED:
+                return
+
+            self._outcomes.append((not succeeded , slow))
+
+            if len(self._outcomes) < self.min_calls:
+                return
+
+            failure_rate = sum(failed for failed , _ in self._outcomes) / len(self._outcomes)
+            slow_rate = sum(slow for _ , slow in self._outcomes) / len(self._outcomes)
+
+            if failure_rate >= self.failure_rate or slow_rate >= self.slow_call_rate:
+                self._open(f"failure_rate={failure_rate:.0%} slow_rate={slow_rate:.0%}")
+
+
+    def abandon(self):
+        # a call let through by allow() that never reached the upstream
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+
+    def _open(self , reason : str):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        logger.warning(f"Circuit open for {self.open_seconds:.0f}s name={self.name} {reason}")
@@ -0,0 +1,151 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from dotenv import load_dotenv
+
+
+# every setting the app reads from the environment (or .env), loaded once
+# per process. modules call get_settings() instead of os.getenv
+
+
+def _int(name : str , default : int) -> int:
+    return int(os.getenv(name , default))
+
+
+def _float(name : str , default : float) -> float:
+    return float(os.getenv(name , default))
+
+
+def _limits(name : str , default : str) -> tuple[int , int , float]:
+    # "max concurrent,max queued,queue timeout seconds"
+    concurrent , queued , timeout = os.getenv(name , default).split(",")
+    return int(concurrent) , int(queued) , float(timeout)
+
+
+def _list(name : str , default : str) -> tuple[str , ...]:
+    return tuple(item.strip() for item in os.getenv(name , default).split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class Settings:
+
+    # database
+    database_url : str
+    read_database_url : str | None
+    read_replica_sticky_seconds : float
+    read_replica_max_lag_seconds : float
+    read_replica_check_seconds : float
+    db_warm_connections : int
+
+    # JWT
+    secret_key : str | None
+    algorithm : str
+    access_token_expire_minutes : int
+    jwt_keys_dir : str
+    jwt_active_kid : str | None
+    jwks_max_age_seconds : int
+
+    # password hashing
+    password_schemes : tuple[str , ...]
+    bcrypt_rounds : int
+    argon2_time_cost : int
+    argon2_memory_cost : int     # KiB
+    argon2_parallelism : int
+
+    # access token denylist
+    revocation_sync_seconds : int
+    revocation_filter_capacity : int
+
+    # Idempotency-Key store
+    idempotency_backend : str
+    idempotency_ttl_seconds : int
+    idempotency_max_entries : int
+    idempotency_wait_seconds : float
+
+    # product change feed
+    change_feed_backend : str
+    change_feed_buffer : int
+
+    # admission control, (max concurrent, max queued, queue timeout) per route class
+    admission_auth : tuple[int , int , float]
+    admission_database : tuple[int , int , float]
+    admission_ai : tuple[int , int , float]
+    admission_bulk : tuple[int , int , float]
+
+    # external services
+    resend_api_key : str | None
+    frontend_url : str | None
+    groq_api_key : str | None
+    groq_pool_size : int
+    groq_deadline_seconds : float
+    groq_hedge_after_seconds : float
+    groq_breaker_failure_rate : float
+    groq_breaker_slow_call_rate : float
+    groq_breaker_slow_call_seconds : float
+    groq_breaker_window : int
+    groq_breaker_min_calls : int
+    groq_breaker_open_seconds : float
+
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+
+        load_dotenv()
+
+        return cls(
+            database_url=os.getenv("DATABASE_URL"),
+            read_database_url=os.getenv("READ_DATABASE_URL") or None,
+            read_replica_sticky_seconds=_float("READ_REPLICA_STICKY_SECONDS" , 5),
+            read_replica_max_lag_seconds=_float("READ_REPLICA_MAX_LAG_SECONDS" , 10),
+            read_replica_check_seconds=_float("READ_REPLICA_CHECK_SECONDS" , 5),
+            db_warm_connections=_int("DB_WARM_CONNECTIONS" , 2),
+
+            secret_key=os.getenv("SECRET_KEY"),
+            algorithm=os.getenv("ALGORITHM" , "HS256"),
+            access_token_expire_minutes=_int("ACCESS_TOKEN_EXPIRE_MINUTES" , 30),
+            jwt_keys_dir=os.getenv("JWT_KEYS_DIR" , "keys"),
+            jwt_active_kid=os.getenv("JWT_ACTIVE_KID") or None,
+            jwks_max_age_seconds=_int("JWKS_MAX_AGE_SECONDS" , 300),
+
+            password_schemes=_list("PASSWORD_SCHEMES" , "bcrypt"),
+            bcrypt_rounds=_int("BCRYPT_ROUNDS" , 12),
+            argon2_time_cost=_int("ARGON2_TIME_COST" , 3),
+            argon2_memory_cost=_int("ARGON2_MEMORY_COST" , 65536),
+            argon2_parallelism=_int("ARGON2_PARALLELISM" , 2),
+
+            revocation_sync_seconds=_int("REVOCATION_SYNC_SECONDS" , 30),
+            revocation_filter_capacity=_int("REVOCATION_FILTER_CAPACITY" , 100000),
+
+            idempotency_backend=os.getenv("IDEMPOTENCY_BACKEND" , "memory"),
+            idempotency_ttl_seconds=_int("IDEMPOTENCY_TTL_SECONDS" , 86400),
+            idempotency_max_entries=_int("IDEMPOTENCY_MAX_ENTRIES" , 10000),
+            idempotency_wait_seconds=_float("IDEMPOTENCY_WAIT_SECONDS" , 30),
+
+            change_feed_backend=os.getenv("CHANGE_FEED_BACKEND" , "local"),
+            change_feed_buffer=_int("CHANGE_FEED_BUFFER" , 1000),
+
+            # the sync routes share anyio's 40 threads, these add up to 36 so
+            # unlimited routes always find a free thread
+            admission_auth=_limits("ADMISSION_AUTH" , "4,32,5"),
+            admission_database=_limits("ADMISSION_DATABASE" , "20,100,5"),
+            admission_ai=_limits("ADMISSION_AI" , "10,50,10"),
+            admission_bulk=_limits("ADMISSION_BULK" , "2,4,30"),
+
+            resend_api_key=os.getenv("RESEND_API_KEY"),
+            frontend_url=os.getenv("FRONTEND_URL"),
+            groq_api_key=os.getenv("GROQ_API_KEY"),
+            groq_pool_size=_int("GROQ_POOL_SIZE" , 10),
+            groq_deadline_seconds=_float("GROQ_DEADLINE_SECONDS" , 8),
+            groq_hedge_after_seconds=_float("GROQ_HEDGE_AFTER_SECONDS" , 3),
+            groq_breaker_failure_rate=_float("GROQ_BREAKER_FAILURE_RATE" , 0.5),
+            groq_breaker_slow_call_rate=_float("GROQ_BREAKER_SLOW_CALL_RATE" , 0.5),
+            groq_breaker_slow_call_seconds=_float("GROQ_BREAKER_SLOW_CALL_SECONDS" , 5),
+            groq_breaker_window=_int("GROQ_BREAKER_WINDOW" , 20),
+            groq_breaker_min_calls=_int("GROQ_BREAKER_MIN_CALLS" , 5),
+            groq_breaker_open_seconds=_float("GROQ_BREAKER_OPEN_SECONDS" , 30),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings.from_env()
@@ -1,18 +1,18 @@
-import os
-from dotenv import load_dotenv
 from core.logger import logger
-import resend
+from core.config import get_settings
 
-load_dotenv()
 
-RESEND_API_KEY = os.getenv("RESEND_API_KEY")
+def send_reset_password_email(to_email : str , reset_link : str):
 
-if not RESEND_API_KEY:
-    logger.error("API key not found")
+    # resend pulls in requests and friends, only import it when a mail goes out
+    import resend
 
-resend.api_key = RESEND_API_KEY
+    api_key = get_settings().resend_api_key
 
-def send_reset_password_email(to_email : str , reset_link : str):
+    if not api_key:
+        logger.error("API key not found")
+
+    resend.api_key = api_key
     
     try : 
         resend.Emails.send(
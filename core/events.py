@@ -0,0 +1,184 @@
+import json
+import time
+import select
+import asyncio
+import itertools
+import threading
+from collections import deque
+from sqlalchemy import text
+from core.logger import logger
+from database import engine
+from core.config import get_settings
+
+
+# change feed for products
+#
+# routes publish an event after their commit, the backend gives it a
+# sequence number and hands it to every worker's broadcaster, which keeps the
+# last CHANGE_FEED_BUFFER events so SSE clients can resume from the last id
+# they saw. a client that fell further behind gets a "reset" event and should
+# refetch /products.
+#
+# CHANGE_FEED_BACKEND=local only reaches clients of the same worker,
+# "postgres" fans out through LISTEN/NOTIFY with a database sequence so ids
+# are shared by all workers. publishing takes a transaction-level advisory
+# lock, so sequence numbers are handed out in commit order and NOTIFY (which
+# is delivered at commit) reaches every listener in seq order. otherwise seq
+# N+1 could overtake N and clients already past N+1 would never see N.
+
+CHANGE_FEED_CHANNEL = "product_changes"
+
+
+class LocalChangeBackend:
+
+    def __init__(self):
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+
+    def start(self , deliver):
+        self._deliver = deliver
+
+
+    def publish(self , event : dict):
+        with self._lock:
+            self._deliver(next(self._counter) , event)
+
+
+class PostgresChangeBackend:
+
+    def __init__(self , engine , channel : str):
+        self.engine = engine
+        self.channel = channel
+
+
+    def start(self , deliver):
+        self._deliver = deliver
+
+        # the {channel}_seq sequence comes from migration 0003, start() may
+        # run on the event loop (subscribe) so it does no database work
+        threading.Thread(target=self._listen , name="change-feed-listener" , daemon=True).start()
+
+
+    def publish(self , event : dict):
+        with self.engine.begin() as conn:
+            # held until commit, serializes nextval + notify across workers
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:channel))") , {"channel" : self.channel})
+            seq = conn.execute(text(f"SELECT nextval('{self.channel}_seq')")).scalar()
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel" : self.channel , "payload" : json.dumps({"seq" : seq , "event" : event})}
+            )
+
+
+    def _listen(self):
+        import psycopg2
+
+        dsn = self.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+        while True:
+            try:
+                conn = psycopg2.connect(dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.channel}")
+                logger.info(f"Change feed listening on channel={self.channel}")
+
+                while True:
+                    if select.select([conn] , [] , [] , 5) == ([] , [] , []):
+                        continue
+
+                    conn.poll()
+
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self._deliver(message["seq"] , message["event"])
+
+            except Exception:
+                logger.error("Change feed listener failed, reconnecting" , exc_info=True)
+                time.sleep(1)
+
+
+class ChangeBroadcaster:
+
+    def __init__(self , backend , buffer_size : int):
+        self.backend = backend
+        self._events = deque(maxlen=buffer_size)
+        self._last_seq = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        self.backend.start(self._deliver)
+
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+
+    def publish(self , event_type : str , data : dict):
+        # called after the change is committed, never fails the request
+
+        self.start()
+
+        try:
+            self.backend.publish({"type" : event_type , "data" : data})
+        except Exception:
+            logger.error(f"Failed to publish change event type={event_type}" , exc_info=True)
+
+
+    def _deliver(self , seq : int , event : dict):
+
+        with self._lock:
+            self._events.append((seq , event))
+            self._last_seq = max(self._last_seq , seq)
+            subscribers = list(self._subscribers)
+
+        for loop , wakeup in subscribers:
+            loop.call_soon_threadsafe(wakeup.set)
+
+
+    def since(self , seq : int) -> tuple[list , bool]:
+        # events after seq, and whether the client has to start over
+
+        with self._lock:
+            if seq > self._last_seq:
+                return [] , True
+
+            if self._events and seq < self._events[0][0] - 1:
+                return [] , True
+
+            return [(event_seq , event) for event_seq , event in self._events if event_seq > seq] , False
+
+
+    def subscribe(self) -> tuple:
+        self.start()
+
+        subscription = (asyncio.get_running_loop() , asyncio.Event())
+
+        with self._lock:
+            self._subscribers.add(subscription)
+
+        return subscription
+
+
+    def unsubscribe(self , subscription : tuple):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+def _build_backend():
+    if get_settings().change_feed_backend == "postgres":
+        return PostgresChangeBackend(engine , CHANGE_FEED_CHANNEL)
+
+    return LocalChangeBackend()
+
+
+product_changes = ChangeBroadcaster(_build_backend() , get_settings().change_feed_buffer)
@@ -0,0 +1,225 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime , timezone , timedelta
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from core.logger import logger
+from database import sessionLocal
+from database_models import IdempotencyRecord
+from core.config import get_settings
+
+
+# Idempotency-Key support for POST routes that must not run twice
+#
+# the first request with a key runs and its response body is stored for
+# IDEMPOTENCY_TTL_SECONDS. a duplicate arriving while the first one is still
+# running waits for it, a duplicate arriving later gets the stored body back.
+# failed requests (HTTPException or crash) are not stored, so the client can
+# retry them. keys are scoped per caller and stored hashed.
+#
+# IDEMPOTENCY_BACKEND=memory keeps records in the worker, "database" shares
+# them between workers through the idempotency_keys table.
+
+settings = get_settings()
+
+
+class MemoryIdempotencyStore:
+
+    def __init__(self , ttl_seconds : int , max_entries : int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._records : OrderedDict[str , dict] = OrderedDict()
+        self._condition = threading.Condition()
+
+
+    def _evict(self , now : float):
+        for key in [key for key , record in self._records.items() if record["expires"] <= now]:
+            del self._records[key]
+
+        # drop the oldest finished records if still over the limit
+        for key in list(self._records):
+            if len(self._records) < self.max_entries:
+                break
+            if self._records[key]["body"] is not None:
+                del self._records[key]
+
+
+    def begin(self , key : str , fingerprint : str , wait_seconds : float):
+        # returns the stored body for a replay, None when the caller should run
+
+        deadline = time.monotonic() + wait_seconds
+
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                record = self._records.get(key)
+
+                if record is not None and record["expires"] <= now:
+                    del self._records[key]
+                    record = None
+
+                if record is None:
+                    if len(self._records) >= self.max_entries:
+                        self._evict(now)
+                    self._records[key] = {
+                        "fingerprint" : fingerprint,
+                        "body" : None,
+                        "expires" : now + self.ttl_seconds,
+                    }
+                    return None
+
+                if record["fingerprint"] != fingerprint:
+                    raise IdempotencyKeyReused()
+
+                if record["body"] is not None:
+                    return record["body"]
+
+                if now >= deadline:
+                    raise IdempotencyInProgress()
+
+                self._condition.wait(deadline - now)
+
+
+    def complete(self , key : str , body):
+        with self._condition:
+            record = self._records.get(key)
+            if record is not None:
+                record["body"] = body
+                record["expires"] = time.monotonic() + self.ttl_seconds
+            self._condition.notify_all()
+
+
+    def abandon(self , key : str):
+        with self._condition:
+            self._records.pop(key , None)
+            self._condition.notify_all()
+
+
+class DatabaseIdempotencyStore:
+
+    poll_interval = 0.2
+
+    def __init__(self , ttl_seconds : int):
+        self.ttl_seconds = ttl_seconds
+
+
+    def begin(self , key : str , fingerprint : str , wait_seconds : float):
+        deadline = time.monotonic() + wait_seconds
+
+        while True:
+            db = sessionLocal()
+
+            try:
+                now = datetime.now(timezone.utc)
+
+                db.query(IdempotencyRecord).filter(
+                    IdempotencyRecord.key == key,
+                    IdempotencyRecord.expires_at <= now
+                ).delete(synchronize_session=False)
+
+                # the primary key makes the insert our reservation. it is only
+                # held for wait_seconds so a crashed worker can't block the key
+                db.add(IdempotencyRecord(
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=now + timedelta(seconds=wait_seconds)
+                ))
+
+                try:
+                    db.commit()
+                    return None
+                except IntegrityError:
+                    db.rollback()
+
+                record = db.get(IdempotencyRecord , key)
+
+            finally:
+                db.close()
+
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    raise IdempotencyKeyReused()
+
+                if record.body is not None:
+                    return json.loads(record.body)
+
+            if time.monotonic() >= deadline:
+                raise IdempotencyInProgress()
+
+            time.sleep(self.poll_interval)
+
+
+    def complete(self , key : str , body):
+        db = sessionLocal()
+
+        try:
+            db.query(IdempotencyRecord).filter(IdempotencyRecord.key == key).update({
+                IdempotencyRecord.body : json.dumps(body),
+                IdempotencyRecord.expires_at : datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds),
+            })
+            db.commit()
+        finally:
+            db.close()
+
+
+    def abandon(self , key : str):
+        db = sessionLocal()
+
+        try:
+            db.query(IdempotencyRecord).filter(IdempotencyRecord.key == key).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+class IdempotencyKeyReused(HTTPException):
+
+    def __init__(self):
+        super().__init__(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request"
+        )
+
+
+class IdempotencyInProgress(HTTPException):
+
+    def __init__(self):
+        super().__init__(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress"
+        )
+
+
+if settings.idempotency_backend == "database":
+    idempotency_store = DatabaseIdempotencyStore(settings.idempotency_ttl_seconds)
+else:
+    idempotency_store = MemoryIdempotencyStore(settings.idempotency_ttl_seconds , settings.idempotency_max_entries)
+
+
+def run_idempotent(idempotency_key : str | None , scope : str , fingerprint : str , func):
+    # runs func() at most once per (scope, key) and returns (body, replayed)
+    # func must return something JSON serializable
+
+    if not idempotency_key:
+        return func() , False
+
+    key = hashlib.sha256(f"{scope}:{idempotency_key}".encode()).hexdigest()
+    fingerprint = hashlib.sha256(fingerprint.encode()).hexdigest()
+
+    stored = idempotency_store.begin(key , fingerprint , settings.idempotency_wait_seconds)
+
+    if stored is not None:
+        logger.info(f"Idempotent replay scope={scope.split(':')[0]}")
+        return stored , True
+
+    try:
+        body = func()
+    except BaseException:
+        idempotency_store.abandon(key)
+        raise
+
+    idempotency_store.complete(key , body)
+    return body , False
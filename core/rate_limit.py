@@ -0,0 +1,43 @@
+import threading
+from functools import lru_cache, wraps
+from fastapi import HTTPException
+
+
+# slowapi (through `limits`) takes ~100 ms to import, so routes are wrapped
+# here and the real slowapi decorator is only built on the first request
+
+
+@lru_cache(maxsize=1)
+def get_limiter():
+    from slowapi import Limiter
+    from slowapi.util import get_remote_address
+
+    return Limiter(key_func=get_remote_address)
+
+
+def limit(limit_value: str):
+
+    def decorator(func):
+        limited = None
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal limited
+
+            # slowapi registers the route limit when decorating, do it once
+            if limited is None:
+                with lock:
+                    if limited is None:
+                        limited = get_limiter().limit(limit_value)(func)
+
+            from slowapi.errors import RateLimitExceeded
+
+            try:
+                return limited(*args, **kwargs)
+            except RateLimitExceeded:
+                raise HTTPException(status_code=429, detail="Too many requests. Slow down.")
+
+        return wrapper
+
+    return decorator
@@ -1,17 +1,28 @@
-import os 
-from dotenv import load_dotenv
-from sqlalchemy import create_engine # making the engine 
+import time
+import hashlib
+import threading
+from fastapi import Request
+from sqlalchemy import create_engine , text # making the engine 
 from sqlalchemy.orm import sessionmaker
+from core.logger import logger
+from core.config import get_settings
 
-load_dotenv()   # loading the DATABASE_URL 
+settings = get_settings()   # loading the DATABASE_URL 
 
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(
-   DATABASE_URL,
-   pool_pre_ping=True,
-   pool_recycle=300,
-                       ) # creating the engine 
+def make_engine(url : str):
+   # sqlite connections are shared with the threadpool
+   connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+   return create_engine(
+      url,
+      pool_pre_ping=True,
+      pool_recycle=300,
+      connect_args=connect_args,
+   )
+
+
+engine = make_engine(settings.database_url) # creating the engine
 
 sessionLocal = sessionmaker(     # making the session 
     autocommit = False,
@@ -20,6 +31,32 @@ sessionLocal = sessionmaker(     # making the session
 )
 
 
+# optional read replica, read-only routes use it through get_read_db
+read_engine = make_engine(settings.read_database_url) if settings.read_database_url else None
+
+readSessionLocal = sessionmaker(
+    autocommit = False,
+    autoflush= False,
+    bind=read_engine
+) if read_engine is not None else sessionLocal
+
+
+def warm_pool(engine , connections : int):
+   # open the connections together so the pool keeps all of them,
+   # the first requests then skip the TCP / TLS / auth handshake
+   opened = []
+
+   try :
+      for _ in range(connections):
+         conn = engine.connect()
+         conn.execute(text("SELECT 1"))
+         opened.append(conn)
+
+   finally :
+      for conn in opened:
+         conn.close()
+
+
 def get_db():
    db = sessionLocal()
 
@@ -28,3 +65,131 @@ def get_db():
 
    finally :
       db.close()
+
+
+
+# read replica routing
+#
+# after a client writes, its reads stay on the primary for
+# READ_REPLICA_STICKY_SECONDS so it sees its own changes. clients are told
+# apart by user id (or IP when nobody is signed in), so the login write and
+# the first reads made with the new token land on the same key. the replica
+# is also skipped while it is unreachable or lags more than
+# READ_REPLICA_MAX_LAG_SECONDS, checked at most every READ_REPLICA_CHECK_SECONDS.
+
+class ReplicaRouter:
+
+   def __init__(self , sticky_seconds : float , max_lag_seconds : float , check_seconds : float):
+      self.sticky_seconds = sticky_seconds
+      self.max_lag_seconds = max_lag_seconds
+      self.check_seconds = check_seconds
+      self._recent_writers : dict[str , float] = {}
+      self._healthy = True
+      self._checked_at = None
+      self._lock = threading.Lock()
+
+
+   def _token_user_id(self , request : Request):
+      # the bearer token is only peeked at, not verified: a forged one can
+      # at most send its own reads to the primary
+      scheme , _ , token = (request.headers.get("authorization") or "").partition(" ")
+
+      if scheme.lower() != "bearer" or not token:
+         return None
+
+      try :
+         from jose import jwt
+         return jwt.get_unverified_claims(token).get("user_id")
+      except Exception :
+         return None
+
+
+   def client_key(self , request : Request) -> str:
+      # request.state.user_id is set by get_current_user and the login route
+      user_id = getattr(request.state , "user_id" , None)
+
+      if user_id is None:
+         user_id = self._token_user_id(request)
+
+      if user_id is not None:
+         credential = f"user:{user_id}"
+      else:
+         credential = f"ip:{request.client.host if request.client else ''}"
+
+      return hashlib.sha256(credential.encode()).hexdigest()
+
+
+   def record_write(self , request : Request):
+      now = time.monotonic()
+
+      with self._lock:
+         if len(self._recent_writers) > 10_000:
+            self._recent_writers = {
+               key : until for key , until in self._recent_writers.items() if until > now
+            }
+         self._recent_writers[self.client_key(request)] = now + self.sticky_seconds
+
+
+   def _is_sticky(self , request : Request) -> bool:
+      until = self._recent_writers.get(self.client_key(request))
+      return until is not None and until > time.monotonic()
+
+
+   def _check_replica(self) -> bool:
+      try:
+         with read_engine.connect() as conn:
+            if read_engine.dialect.name == "postgresql":
+               # the replay timestamp keeps ageing while the primary is idle,
+               # so it only counts when WAL has been received but not replayed
+               lag = conn.execute(text(
+                  "SELECT CASE WHEN pg_last_wal_receive_lsn() IS NOT DISTINCT FROM pg_last_wal_replay_lsn() THEN 0 "
+                  "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+               )).scalar()
+
+               if lag > self.max_lag_seconds:
+                  logger.warning(f"Read replica lagging lag={lag:.1f}s, using primary")
+                  return False
+            else:
+               conn.execute(text("SELECT 1"))
+
+         return True
+
+      except Exception as e:
+         logger.warning(f"Read replica unavailable, using primary: {e}")
+         return False
+
+
+   def replica_healthy(self) -> bool:
+      now = time.monotonic()
+
+      with self._lock:
+         if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+            return self._healthy
+         self._checked_at = now
+
+      self._healthy = self._check_replica()
+      return self._healthy
+
+
+   def use_replica(self , request : Request) -> bool:
+      if read_engine is None:
+         return False
+
+      return not self._is_sticky(request) and self.replica_healthy()
+
+
+replica_router = ReplicaRouter(
+   sticky_seconds=settings.read_replica_sticky_seconds,
+   max_lag_seconds=settings.read_replica_max_lag_seconds,
+   check_seconds=settings.read_replica_check_seconds,
+)
+
+
+def get_read_db(request : Request):
+   db = readSessionLocal() if replica_router.use_replica(request) else sessionLocal()
+
+   try :
+      yield db
+
+   finally :
+      db.close()
@@ -1,5 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base  # this is used to convert python classes into DB tables
-from sqlalchemy import Column , Integer , Float , String  # this is for making columns and their dtypes
+from sqlalchemy import Column , Integer , Float , String , Text , DateTime  # this is for making columns and their dtypes
 
 
 
@@ -14,6 +14,7 @@ class Product(Base):
     description = Column(String)
     price = Column(Float)
     quantity = Column(Integer)
+    version = Column(Integer, nullable=False, default=1, server_default="1")   # bumped on every update, used as ETag
 
 
 class AIUser(Base):
@@ -26,3 +27,13 @@ class AIUser(Base):
     usage_count = Column(Integer, default=0)
     last_reset = Column(String)
     plan = Column(String, default="free")
+
+
+class IdempotencyRecord(Base):
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)          # sha256 of scope + Idempotency-Key
+    fingerprint = Column(String, nullable=False)
+    body = Column(Text, nullable=True)              # null while the first request runs
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
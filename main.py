@@ -1,32 +1,131 @@
-from fastapi import FastAPI, HTTPException, status, Depends
+from core import boot_timing
+
+from fastapi import FastAPI, HTTPException, status, Depends, Header, Request, Response
+from fastapi.responses import StreamingResponse, JSONResponse
+from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
-from fastapi.responses import JSONResponse
+from sqlalchemy import update, func, select
+import orjson
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import sessionLocal, engine, get_db
+boot_timing.mark("framework imports")
+
+from database import get_db, get_read_db, replica_router, engine, read_engine, warm_pool
 import database_models
-from models import ProductCreate, ProductResponse
+from models import ProductCreate, ProductResponse, ProductUpdate, QuantityAdjustment
 
-from auth.routes import router as auth_router
-from auth.utils import get_current_user
+from auth.routes import router as auth_router, jwks_router
+from auth.utils import get_current_user, get_streaming_user, warm_crypto
 from core.logger import logger
+from core.config import get_settings
+from core import rate_limit
+from core.idempotency import run_idempotent
+from core.events import product_changes
+from core.admission import AdmissionControlMiddleware, RouteClass
+import asyncio
+import json
+import threading
+import time
 
 # -------------------------------
 # NEW IMPORTS (AI + RATE LIMIT)
 # -------------------------------
-from ai_routes import router as ai_router
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from ai_routes import router as ai_router, warm_groq_connection
+from transfer_routes import router as transfer_router
+
+boot_timing.mark("app imports")
+
+
+# -------------------------------
+# Lifespan (warm-up + readiness)
+# -------------------------------
+def warm_up(app: FastAPI, stop: threading.Event):
+    settings = get_settings()
+    started = time.perf_counter()
+
+    # a worker without its database is useless, keep trying until it answers
+    while not stop.is_set():
+        try:
+            warm_pool(engine, settings.db_warm_connections)
+            break
+        except Exception as e:
+            logger.error(f"Warm-up: database unreachable, retrying: {e}")
+            stop.wait(2)
+
+    optional_steps = [
+        ("read replica", lambda: read_engine is not None and warm_pool(read_engine, settings.db_warm_connections)),
+        ("crypto", warm_crypto),
+        ("rate limiter", rate_limit.get_limiter),
+        ("groq connection", warm_groq_connection),
+    ]
+
+    for name, step in optional_steps:
+        if stop.is_set():
+            return
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Warm-up step failed step={name}: {e}")
+
+    app.state.ready = True
+    logger.info(f"Worker ready, warm-up took {(time.perf_counter() - started) * 1000:.0f}ms")
+
+
+# the schema is managed by alembic (`alembic upgrade head`, run at deploy
+# time), so booting a worker doesn't touch the database catalog.
+# warm-up runs in the background: "/" answers right away, "/ready" once warm
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    boot_timing.mark("app setup")
+    logger.info(f"Application startup completed {boot_timing.summary()}")
+
+    app.state.ready = False
+    stop = threading.Event()
+    threading.Thread(target=warm_up, args=(app, stop), name="warm-up", daemon=True).start()
+
+    yield
+
+    stop.set()
+    engine.dispose()
+    if read_engine is not None:
+        read_engine.dispose()
+
+    logger.info("Application shutdown completed")
 
 
 # -------------------------------
 # App Setup
 # -------------------------------
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # middleware 
 
+# separate concurrency limits per route class, see core/admission.py.
+# added before CORS so shed responses still carry the CORS headers
+settings = get_settings()
+
+auth_class = RouteClass("auth", *settings.admission_auth)
+database_class = RouteClass("database", *settings.admission_database)
+ai_class = RouteClass("ai", *settings.admission_ai)
+bulk_class = RouteClass("bulk", *settings.admission_bulk)
+
+app.add_middleware(
+    AdmissionControlMiddleware,
+    route_classes=[
+        ("/auth/login", auth_class),
+        ("/auth/register", auth_class),
+        ("/auth/refresh", auth_class),
+        ("/auth/reset-paasword", auth_class),
+        ("/auth/forgot-password", auth_class),    # token hashing + blocking Resend call
+        ("/ai/", ai_class),
+        ("/products/export", bulk_class),
+        ("/products/import", bulk_class),
+        ("/products/changes", None),    # long-lived SSE, never limited
+        ("/products", database_class),
+        ("/product", database_class),
+    ]
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -39,25 +138,24 @@ app.add_middleware(
 
 
 # -------------------------------
-# Rate Limiter Setup
+# Routers
 # -------------------------------
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
+app.include_router(auth_router)
+app.include_router(jwks_router)
+app.include_router(ai_router)  # NEW AI ROUTER
+app.include_router(transfer_router)
 
 
-@app.exception_handler(RateLimitExceeded)
-def rate_limit_handler(request, exc):
-    return JSONResponse(
-        status_code=429,
-        content={"detail": "Too many requests. Slow down."},
-    )
+# unsafe requests pin the client to the primary for a few seconds so the
+# replica can't hide its own write from it
+@app.middleware("http")
+async def track_writes_for_replica(request: Request, call_next):
+    response = await call_next(request)
 
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        replica_router.record_write(request)
 
-# -------------------------------
-# Routers
-# -------------------------------
-app.include_router(auth_router)
-app.include_router(ai_router)  # NEW AI ROUTER
+    return response
 
 
 @app.get("/")
@@ -65,39 +163,165 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    if not app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "warming up"})
+
+    return {"status": "ready"}
+
+
 # -------------------------------
-# Startup
+# Product Helpers
 # -------------------------------
-@app.on_event("startup")
-def startup():
-    logger.info("Application startup initiated")
+PRODUCT_COLUMNS = (
+    database_models.Product.id,
+    database_models.Product.name,
+    database_models.Product.description,
+    database_models.Product.price,
+    database_models.Product.quantity,
+    database_models.Product.version,
+)
+
+
+def product_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def parse_if_match(if_match: str | None) -> int | None:
+    if if_match is None or if_match.strip() == "*":
+        return None
 
     try:
-        database_models.Base.metadata.create_all(bind=engine)
-        logger.info("Database tables ensured successfully")
-    except Exception as e:
-        logger.error(f"Database startup failed: {e}")
-        raise
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Invalid If-Match header")
+
+
+def apply_product_update(db: Session, id: int, values: dict, *conditions):
+    # single UPDATE ... RETURNING, the row is never read first.
+    # returns None when the row is missing or a condition didn't hold
+    Product = database_models.Product
+
+    statement = (
+        update(Product)
+        .where(Product.id == id, *conditions)
+        .values(**values, version=Product.version + 1)
+        .returning(*PRODUCT_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+
+    row = db.execute(statement).mappings().first()
+    db.commit()
+
+    return dict(row) if row else None
+
 
-    logger.info("Application startup completed")
+def product_exists(db: Session, id: int) -> bool:
+    return db.query(database_models.Product.id).filter(
+        database_models.Product.id == id
+    ).first() is not None
+
+
+def update_product_fields(db: Session, id: int, values: dict, if_match: str | None):
+    Product = database_models.Product
+
+    conditions = []
+    expected_version = parse_if_match(if_match)
+
+    if expected_version is not None:
+        conditions.append(Product.version == expected_version)
+
+    row = apply_product_update(db, id, values, *conditions)
+
+    if row is None:
+        if not product_exists(db, id):
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Product was modified by another request")
+
+    product_changes.publish("product.updated", row)
+    return row
 
 
 # -------------------------------
-# Product Routes (UNCHANGED)
+# Product Routes
 # -------------------------------
 @app.get("/products", response_model=list[ProductResponse])
 def get_all_products(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
     logger.info(f"Products fetched by user_id={current_user.id}")
-    return db.query(database_models.Product).all()
+
+    # plain column rows encoded straight to JSON, skipping ORM entities and
+    # per-row Pydantic validation. see benchmarks/serialization.py
+    rows = db.execute(select(*PRODUCT_COLUMNS)).mappings()
+
+    return Response(
+        content=orjson.dumps([dict(row) for row in rows]),
+        media_type="application/json"
+    )
+
+
+CHANGE_FEED_HEARTBEAT_SECONDS = 15
+
+
+@app.get("/products/changes")
+async def stream_product_changes(
+    since: int | None = None,
+    last_event_id: str | None = Header(default=None),
+    current_user=Depends(get_streaming_user)
+):
+    # server-sent events: fetch /products once, then apply these deltas.
+    # reconnecting clients resume from Last-Event-ID (or ?since=)
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    logger.info(f"Change feed opened by user_id={current_user.id}")
+
+    async def events():
+        cursor = product_changes.last_seq if since is None else since
+        loop, wakeup = subscription = product_changes.subscribe()
+
+        try:
+            yield f"retry: 3000\nid: {cursor}\n\n"
+
+            while True:
+                wakeup.clear()
+                changes, reset = product_changes.since(cursor)
+
+                if reset:
+                    cursor = product_changes.last_seq
+                    yield f"id: {cursor}\nevent: reset\ndata: {{}}\n\n"
+                    continue
+
+                for seq, event in changes:
+                    cursor = seq
+                    yield f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+                if changes:
+                    continue
+
+                try:
+                    await asyncio.wait_for(wakeup.wait(), CHANGE_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+
+        finally:
+            product_changes.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.get("/product/{id}", response_model=ProductResponse)
 def get_product_by_id(
     id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
     product = db.query(database_models.Product).filter(
@@ -108,6 +332,7 @@ def get_product_by_id(
         raise HTTPException(status_code=404, detail="Product not found")
 
     logger.info(f"Product {id} fetched by user_id={current_user.id}")
+    response.headers["ETag"] = product_etag(product.version)
     return product
 
 
@@ -118,42 +343,101 @@ def get_product_by_id(
 )
 def add_product(
     product: ProductCreate,
+    response: Response,
+    idempotency_key: str | None = Header(default=None),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    db_product = database_models.Product(**product.model_dump())
-    db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    def create():
+        db_product = database_models.Product(**product.model_dump())
+        db.add(db_product)
+        db.commit()
+        db.refresh(db_product)
+
+        logger.info(f"Product created by user_id={current_user.id}")
+        created = ProductResponse.model_validate(db_product).model_dump()
+        product_changes.publish("product.created", created)
+        return created
+
+    body, replayed = run_idempotent(
+        idempotency_key,
+        scope=f"product:{current_user.id}",
+        fingerprint=product.model_dump_json(),
+        func=create
+    )
+
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
 
-    logger.info(f"Product created by user_id={current_user.id}")
-    return db_product
+    return body
 
 
 @app.put("/product/{id}", response_model=ProductResponse)
 def update_product(
     id: int,
     product: ProductCreate,
+    response: Response,
+    if_match: str | None = Header(default=None),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    db_product = db.query(database_models.Product).filter(
-        database_models.Product.id == id
-    ).first()
+    row = update_product_fields(db, id, product.model_dump(), if_match)
 
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    logger.info(f"Product {id} updated by user_id={current_user.id}")
+    response.headers["ETag"] = product_etag(row["version"])
+    return row
 
-    db_product.name = product.name
-    db_product.description = product.description
-    db_product.price = product.price
-    db_product.quantity = product.quantity
 
-    db.commit()
-    db.refresh(db_product)
+@app.patch("/product/{id}", response_model=ProductResponse)
+def patch_product(
+    id: int,
+    product: ProductUpdate,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    # only the fields sent by the client end up in the UPDATE
+    values = product.model_dump(exclude_unset=True)
 
-    logger.info(f"Product {id} updated by user_id={current_user.id}")
-    return db_product
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    row = update_product_fields(db, id, values, if_match)
+
+    logger.info(f"Product {id} patched fields={sorted(values)} by user_id={current_user.id}")
+    response.headers["ETag"] = product_etag(row["version"])
+    return row
+
+
+@app.patch("/product/{id}/quantity", response_model=ProductResponse)
+def adjust_product_quantity(
+    id: int,
+    adjustment: QuantityAdjustment,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    Product = database_models.Product
+    current_quantity = func.coalesce(Product.quantity, 0)
+
+    # relative change applied by the database, safe under concurrent writers
+    row = apply_product_update(
+        db,
+        id,
+        {"quantity": current_quantity + adjustment.delta},
+        current_quantity + adjustment.delta >= 0
+    )
+
+    if row is None:
+        if not product_exists(db, id):
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Insufficient stock")
+
+    product_changes.publish("product.updated", row)
+    logger.info(f"Product {id} quantity adjusted by {adjustment.delta} by user_id={current_user.id}")
+    response.headers["ETag"] = product_etag(row["version"])
+    return row
 
 
 @app.delete("/product/{id}")
@@ -172,5 +456,7 @@ def delete_product(
     db.delete(db_product)
     db.commit()
 
+    product_changes.publish("product.deleted", {"id": id})
+
     logger.warning(f"Product {id} deleted by user_id={current_user.id}")
     return {"message": "deleted successfully"}
@@ -0,0 +1,95 @@
+"""initial schema, as created by Base.metadata.create_all before migrations
+
+Databases created by the old startup hook already have these tables, they
+are skipped, so `alembic upgrade head` works on those as well.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not has_table("product"):
+        op.create_table(
+            "product",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String()),
+            sa.Column("description", sa.String()),
+            sa.Column("price", sa.Float()),
+            sa.Column("quantity", sa.Integer()),
+        )
+        op.create_index("ix_product_id", "product", ["id"])
+
+    if not has_table("ai_users"):
+        op.create_table(
+            "ai_users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String()),
+            sa.Column("api_key", sa.String()),
+            sa.Column("usage_count", sa.Integer()),
+            sa.Column("last_reset", sa.String()),
+            sa.Column("plan", sa.String()),
+        )
+        op.create_index("ix_ai_users_id", "ai_users", ["id"])
+        op.create_index("ix_ai_users_email", "ai_users", ["email"], unique=True)
+        op.create_index("ix_ai_users_api_key", "ai_users", ["api_key"], unique=True)
+
+    if not has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("failed_login_attempts", sa.Integer()),
+            sa.Column("lock_until", sa.DateTime(timezone=True)),
+            sa.Column("last_failed_login", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if not has_table("refresh_tokens"):
+        op.create_table(
+            "refresh_tokens",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("token_hash", sa.String(), nullable=False, unique=True),
+            sa.Column("experies_at", sa.DateTime(), nullable=False),
+            sa.Column("revoked", sa.Boolean()),
+            sa.Column("created_by", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_refresh_tokens_id", "refresh_tokens", ["id"])
+
+    if not has_table("password_reset_tokens"):
+        op.create_table(
+            "password_reset_tokens",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("token_hash", sa.String(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("used", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_password_reset_tokens_id", "password_reset_tokens", ["id"])
+        op.create_index("ix_password_reset_tokens_token_hash", "password_reset_tokens", ["token_hash"])
+
+
+def downgrade():
+    op.drop_table("password_reset_tokens")
+    op.drop_table("refresh_tokens")
+    op.drop_table("users")
+    op.drop_table("ai_users")
+    op.drop_table("product")
@@ -0,0 +1,59 @@
+"""product version column, revoked access tokens and idempotency keys
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def has_column(table, name):
+    return any(column["name"] == name for column in sa.inspect(op.get_bind()).get_columns(table))
+
+
+# a worker that ran the old create_all hook with the newer models may have
+# created any of these already, they are skipped
+def upgrade():
+    if not has_column("product", "version"):
+        with op.batch_alter_table("product") as batch:
+            batch.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+    if not has_table("revoked_tokens"):
+        op.create_table(
+            "revoked_tokens",
+            sa.Column("jti", sa.String(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_revoked_tokens_expires_at", "revoked_tokens", ["expires_at"])
+
+    if not has_table("idempotency_keys"):
+        op.create_table(
+            "idempotency_keys",
+            sa.Column("key", sa.String(), primary_key=True),
+            sa.Column("fingerprint", sa.String(), nullable=False),
+            sa.Column("body", sa.Text()),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        )
+        op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+
+def downgrade():
+    op.drop_table("idempotency_keys")
+    op.drop_table("revoked_tokens")
+
+    with op.batch_alter_table("product") as batch:
+        batch.drop_column("version")
@@ -0,0 +1,25 @@
+"""sequence numbering the product change feed (CHANGE_FEED_BACKEND=postgres)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+# only the postgres change feed backend uses it, see core/events.py
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE SEQUENCE IF NOT EXISTS product_changes_seq")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP SEQUENCE IF EXISTS product_changes_seq")
@@ -1,14 +1,29 @@
-from pydantic import BaseModel
+from pydantic import BaseModel , Field
 
 class ProductCreate(BaseModel):
     name : str
     description : str
     price : float
-    quantity : int
+    quantity : int = Field(ge=0)
+
+
+class ProductUpdate(BaseModel):
+    # every field is optional, but one that is sent can't be null
+    # (the None defaults are not validated, an explicit null is)
+    name : str = None
+    description : str = None
+    price : float = None
+    quantity : int = Field(default=None , ge=0)
+
+
+class QuantityAdjustment(BaseModel):
+    delta : int
 
 
 class ProductResponse(ProductCreate):
     id: int 
+    version: int
+    quantity : int      # no bound on output, rows stored before the check must still load
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
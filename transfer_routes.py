@@ -0,0 +1,246 @@
+from fastapi import APIRouter, Depends, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert
+from pydantic import ValidationError
+import csv
+import io
+import json
+
+import database_models
+from database import sessionLocal, readSessionLocal, replica_router, get_db
+from models import ProductCreate
+from auth.utils import get_streaming_user
+from core.events import product_changes
+from core.logger import logger
+
+router = APIRouter(tags=["Products"])
+
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+TRANSFER_FIELDS = ["name", "description", "price", "quantity"]
+
+Product = database_models.Product
+
+
+# ================================
+# Export
+# ================================
+
+def export_batches():
+    # own session, opened when the body starts streaming and closed when it
+    # ends. the route authenticates with get_streaming_user so no other
+    # connection is held meanwhile. yield_per turns on a server-side cursor,
+    # so memory stays flat
+    use_replica = readSessionLocal is not sessionLocal and replica_router.replica_healthy()
+    db = readSessionLocal() if use_replica else sessionLocal()
+
+    try:
+        result = db.execute(
+            select(Product.id, *(getattr(Product, field) for field in TRANSFER_FIELDS))
+            .order_by(Product.id)
+            .execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        )
+
+        for batch in result.partitions():
+            yield batch
+
+    finally:
+        db.close()
+
+
+def export_ndjson():
+    for batch in export_batches():
+        yield "".join(json.dumps(row._asdict()) + "\n" for row in batch)
+
+
+def export_csv():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(["id", *TRANSFER_FIELDS])
+
+    for batch in export_batches():
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+@router.get("/products/export")
+def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user=Depends(get_streaming_user)
+):
+    logger.info(f"Product export ({format}) started by user_id={current_user.id}")
+
+    if format == "csv":
+        return StreamingResponse(
+            export_csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="products.csv"'}
+        )
+
+    return StreamingResponse(
+        export_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="products.ndjson"'}
+    )
+
+
+# ================================
+# Import
+# ================================
+
+def read_ndjson(stream):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+
+        yield line_number, record, None
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+
+    for record in reader:
+        yield reader.line_num, record, None
+
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def copy_batch(db: Session, batch: list[ProductCreate]):
+    # postgres: one COPY per batch instead of an INSERT per row.
+    # strings are quoted so "" stays an empty string (unquoted empty = NULL)
+    buffer = io.StringIO()
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(
+        [getattr(product, field) for field in TRANSFER_FIELDS] for product in batch
+    )
+    buffer.seek(0)
+
+    with db.connection().connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {Product.__tablename__} ({', '.join(TRANSFER_FIELDS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
+
+def insert_batch(db: Session, batch: list[ProductCreate]):
+    db.execute(insert(Product), [product.model_dump() for product in batch])
+
+
+def progress_line(record: dict) -> str:
+    return json.dumps(record) + "\n"
+
+
+@router.post("/products/import")
+def import_products(
+    file: UploadFile = File(...),
+    format: str | None = Query(None, pattern="^(ndjson|csv)$"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_streaming_user)
+):
+    # the upload is spooled to disk by starlette and read line by line,
+    # valid rows are written and committed in batches of IMPORT_BATCH_SIZE.
+    # the response is NDJSON: one "progress" record per committed batch with
+    # the new per-line errors, then a "summary" (or an "error") record
+    if format is None:
+        format = "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    records = read_csv(stream) if format == "csv" else read_ndjson(stream)
+
+    write_batch = copy_batch if db.get_bind().dialect.name == "postgresql" else insert_batch
+
+    def run_import():
+        imported = 0
+        failed = 0
+        errors = []         # first MAX_REPORTED_ERRORS, for the summary
+        new_errors = []     # since the last progress record
+        batch = []
+        line_number = 0
+
+        def flush():
+            nonlocal imported
+
+            if batch:
+                write_batch(db, batch)
+                db.commit()
+                imported += len(batch)
+                batch.clear()
+
+            logger.info(f"Product import progress rows={imported} failed={failed} user_id={current_user.id}")
+
+            record = {
+                "type": "progress",
+                "imported": imported,
+                "failed": failed,
+                "errors": new_errors[:MAX_REPORTED_ERRORS],
+                "errors_truncated": len(new_errors) > MAX_REPORTED_ERRORS
+            }
+            new_errors.clear()
+            return progress_line(record)
+
+        try:
+            for line_number, record, error in records:
+                if error is None:
+                    try:
+                        batch.append(ProductCreate.model_validate(record))
+                    except ValidationError as e:
+                        error = format_validation_error(e)
+
+                if error is not None:
+                    failed += 1
+                    line_error = {"line": line_number, "error": error}
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append(line_error)
+                    if len(new_errors) <= MAX_REPORTED_ERRORS:
+                        new_errors.append(line_error)
+
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    yield flush()
+
+            if batch or new_errors:
+                yield flush()
+
+        except UnicodeDecodeError:
+            # headers are already sent, so the failure is reported in the body
+            yield progress_line({
+                "type": "error",
+                "detail": f"File is not valid UTF-8 after line {line_number}, {imported} rows were imported",
+                "imported": imported,
+                "failed": failed
+            })
+            return
+
+        finally:
+            if imported:
+                product_changes.publish("product.bulk_imported", {"count": imported})
+
+        logger.info(f"Product import finished rows={imported} failed={failed} user_id={current_user.id}")
+
+        yield progress_line({
+            "type": "summary",
+            "imported": imported,
+            "failed": failed,
+            "errors": errors,
+            "errors_truncated": failed > len(errors)
+        })
+
+    return StreamingResponse(run_import(), media_type="application/x-ndjson")